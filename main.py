@@ -24,30 +24,48 @@ import os
 import time
 import json
 import threading
-import subprocess
-import math
-import re
+import importlib.util
 import random
+import platform
+import asyncio
+import queue
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
 import tkinter as tk
-from tkinter import simpledialog, messagebox, Toplevel, Label, Entry, Button, IntVar, Frame, LabelFrame, OptionMenu, StringVar
-from datetime import datetime
+from tkinter import Toplevel, Label, Entry, Button, Frame, LabelFrame, OptionMenu, StringVar
+from urllib.parse import quote
+from types import MappingProxyType
 
 # ==========================================
 # 1. DEPENDENCY CHECK
 # ==========================================
 try:
     import vlc
-    import psutil
+    # psutil is imported lazily by the stats sampler; only verify it is installed
+    if importlib.util.find_spec("psutil") is None:
+        raise ImportError("No module named 'psutil'")
 except ImportError as e:
+    from tkinter import messagebox
     root = tk.Tk(); root.withdraw()
     messagebox.showerror("Dependency Error", f"Missing Libs: {e}\nPlease run setup.sh")
     sys.exit(1)
 
+try:
+    import uvloop # Optional: faster event loop for background I/O
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson # Optional: faster config (de)serialisation
+except ImportError:
+    orjson = None
+
 # ==========================================
 # 2. CONFIGURATION & DEFAULTS
 # ==========================================
 CONFIG_FILE = "nvr_config.json"
-DEFAULT_CONFIG = {
+DEFAULT_CONFIG = MappingProxyType({ # Read-only; load_config() merges it under the saved values
     "nvr_ip": "192.168.1.108",
     "nvr_port": "554",
     "nvr_user": "admin",
@@ -55,75 +73,260 @@ DEFAULT_CONFIG = {
     "subtype": "1",           # 0=Main, 1=Sub (Default 1 for performance)
     "admin_pass": "admin",
     "tour_interval": 10,      # Seconds per page
+    "network_caching": 100,   # Per-stream RTSP buffer (ms)
+    "rtsp_transport": "tcp",  # "tcp" (robust) or "udp" (lower latency on a clean wired LAN)
     "grid_size": 4,           # Number of cameras per page
     "active_cameras": []      # List of enabled camera IDs
-}
+})
+
+def dumps_json(obj):
+    """Serialises to indented JSON bytes (orjson when available)."""
+    if orjson: return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode() # Same layout as orjson OPT_INDENT_2
+
+def loads_json(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def write_json_atomic(path, data):
+    """
+    Writes JSON (an object, or bytes from dumps_json) via temp file +
+    fsync + os.replace, so a power cut on the SD card leaves either the
+    old or the new file, never a truncated one.
+    """
+    if not isinstance(data, bytes): data = dumps_json(data)
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, path)
+
+STREAM_START_TIMEOUT_MS = 8000 # Max wait for MediaPlayerPlaying before a retry
+STAGGER_MS = 120               # Delay between cell stream starts on a page turn
+
+STREAM_KEYS = ("nvr_ip", "nvr_port", "nvr_user", "nvr_pass", "subtype", "network_caching", "rtsp_transport") # Baked into each vlc.Media
+
+STAT_KEYS = ("cpu", "ram", "temp", "disk", "net", "ping")
+THERMAL_FILE = "/sys/class/thermal/thermal_zone0/temp"
+STAT_FILES = ("/proc/stat", "/proc/meminfo", "/proc/net/dev", THERMAL_FILE)
+
+CELL_EVENTS = ( # libVLC player event -> cell state
+    (vlc.EventType.MediaPlayerPlaying, "ok"),
+    (vlc.EventType.MediaPlayerEncounteredError, "lost"),
+    (vlc.EventType.MediaPlayerEndReached, "lost"),
+    (vlc.EventType.MediaPlayerStopped, "lost"),
+)
+
+async def tcp_probe(addr, timeout=0.3):
+    """
+    Measures NVR reachability with a TCP connect to addr, the RTSP
+    (host, port). Returns the connect time in ms, or None if unreachable.
+    No fork/exec, and an ICMP-filtered NVR still passes. A bare socket
+    is enough: no stream reader/writer pair is built for a connect-only probe.
+    """
+    if addr is None: return None
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET6 if ":" in addr[0] else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        t0 = time.perf_counter()
+        await asyncio.wait_for(loop.sock_connect(sock, addr), timeout)
+        return (time.perf_counter() - t0) * 1000
+    except (OSError, ValueError, asyncio.TimeoutError):
+        return None
+    finally:
+        sock.close()
 
 class CameraCell:
     """
     Represents a single video slot in the grid.
     Manages VLC player and overlay information.
     """
-    def __init__(self, parent, vlc_instance):
+    def __init__(self, parent, get_instance, get_media, post):
         self.frame = tk.Frame(parent, bg="black", bd=1, relief="sunken")
-        self.vlc_instance = vlc_instance
-        self.player = None
+        self.get_instance = get_instance # Returns the app's (lazily created) vlc.Instance
+        self.get_media = get_media # Shared vlc.Media cache lookup (by channel id)
+        self.post = post # Runs a call on the Tk thread; the only way other threads reach this cell
+        self.stream = None       # (cam_id, is_filler) while assigned
+        self.retry_timer = None
+        self.start_timer = None  # Fires if Playing never arrives
+        self.backoff = 1.0       # Seconds until the next reconnect attempt
+        self.generation = 0      # Bumped on every stop; events from older streams are ignored
+        self.stop_inflight = False # player.stop() is running on a helper thread, see _stop_async
         
         # Center Status Text
         self.status_label = tk.Label(self.frame, text="", bg="black", fg="white", font=("Arial", 12))
-        self.status_label.place(relx=0.5, rely=0.5, anchor="center")
+        self._status_visible = False # Placed only while shown, see show_status
         
         # Camera Name Overlay
         self.name_label = tk.Label(self.frame, text="", bg="black", fg="#00ff00", font=("Arial", 10, "bold"))
         self.name_label.place(relx=0.02, rely=0.02, anchor="nw")
+        self._label_state = {self.status_label: ("", "white"), self.name_label: ("", "#00ff00")} # Last (text, fg) applied
+        
+        # One player for the cell's lifetime, created on first play; page turns only swap its media
+        self.player = None
+        self.media = None # vlc.Media currently set on the player
+        self._playing = False # play() issued and not stopped since
+        self._events = None # The player's EventManager; owns the ctypes callback, so it must outlive the player
+
+    def _create_player(self):
+        self.player = self.get_instance().media_player_new()
+        if sys.platform.startswith('linux'):
+            self.player.set_xwindow(self.frame.winfo_id())
+        else:
+            self.player.set_hwnd(self.frame.winfo_id())
+            
+        # Push state changes from VLC instead of polling get_state()
+        self._events = self.player.event_manager()
+        for ev, state in CELL_EVENTS:
+            self._events.event_attach(ev, self._on_vlc_event, state)
 
-    def play(self, rtsp_url, cam_id, is_filler=False):
-        """Starts playing a stream in this cell."""
+    def play(self, cam_id, is_filler=False):
+        """Starts playing a camera in this cell."""
+        if not self.stream or self.stream[0] != cam_id:
+            self.backoff = 1.0 # New stream: start backoff over
         self.stop() # Ensure clean state
+        self.stream = (cam_id, is_filler)
         
         # Mark random fillers visually (optional, can remove "(R)" if preferred)
         display_name = f"CAM {cam_id}" # + (" (R)" if is_filler else "")
         
-        self.name_label.config(text=display_name, fg="#ffff00" if is_filler else "#00ff00")
-        self.status_label.config(text="Loading...", fg="yellow")
-        self.status_label.lift()
+        self.set_text(self.name_label, display_name, "#ffff00" if is_filler else "#00ff00")
+        self.set_text(self.status_label, "Loading...", "yellow")
+        self.show_status(True)
         self.name_label.lift()
+        if self.stop_inflight: return # The helper thread still owns the player; _resume starts self.stream
         
         try:
-            self.player = self.vlc_instance.media_player_new()
-            media = self.vlc_instance.media_new(rtsp_url)
-            self.player.set_media(media)
-            
-            if sys.platform.startswith('linux'):
-                self.player.set_xwindow(self.frame.winfo_id())
-            else:
-                self.player.set_hwnd(self.frame.winfo_id())
-                
+            if not self.player: self._create_player()
+            media = self.get_media(cam_id)
+            if media is not self.media: # Reconnects replay the media already set
+                self.player.set_media(media)
+                self.media = media
             self.player.play()
-            self.status_label.lower() 
+            self._playing = True
+            # "Loading..." stays up until MediaPlayerPlaying; a stream that never starts counts as lost
+            self.start_timer = self.frame.after(STREAM_START_TIMEOUT_MS, self._apply_state, self.generation, "lost")
             
         except Exception as e:
-            self.status_label.config(text=f"Error: {e}", fg="red")
-            self.status_label.lift()
+            self.set_text(self.status_label, f"Error: {e}", "red")
+            self.show_status(True)
 
     def stop(self):
-        """Stops playback and releases VLC resources."""
-        if self.player:
-            self.player.stop()
-            self.player.release()
-            self.player = None
-        self.status_label.config(text="")
-        self.name_label.config(text="")
-
-    def check_health(self):
-        """Checks VLC state."""
-        if self.player:
-            state = self.player.get_state()
-            if state in [vlc.State.Error, vlc.State.Ended, vlc.State.Stopped]:
-                self.status_label.config(text="No Signal", fg="red")
-                self.status_label.lift()
-            elif state == vlc.State.Playing:
-                self.status_label.lower()
+        """Stops playback off the Tk thread; the player itself is kept for the next stream."""
+        self._cancel_timers()
+        self.stream = None
+        if self._playing: self._stop_async() # Cleared while a teardown runs, so stop() is never issued twice
+        self.generation += 1 # Events from the stopped stream are now stale
+        self.set_text(self.status_label, "")
+        self.set_text(self.name_label, "")
+
+    def _stop_async(self):
+        """
+        Runs player.stop() on a helper thread: stop() on a wedged RTSP demuxer
+        can block for seconds and would freeze the Tk loop. Until _resume, the
+        cell only records play()/stop() calls.
+        """
+        player = self.player
+        self.stop_inflight = True
+        self._playing = False
+        player.retain() # Keeps the player alive if the cell is released meanwhile
+        def teardown():
+            try: player.stop()
+            finally: player.release()
+            self.post(self._resume)
+        threading.Thread(target=teardown, daemon=True).start()
+
+    def show_empty(self):
+        """Stops the cell and shows "EMPTY". A no-op if it already does."""
+        if not self.stream and self._status_visible and self._label_state[self.status_label][0] == "EMPTY": return
+        self.stop()
+        self.set_text(self.status_label, "EMPTY", "#333")
+        self.show_status(True)
+
+    def detach(self):
+        """
+        Cancels pending timers, detaches the VLC callbacks and hands back the
+        player (or None) for the caller to stop/release. The cell is unusable
+        afterwards.
+        """
+        self._cancel_timers()
+        self.stream = None
+        self.generation += 1
+        self.media = None
+        self._playing = False
+        if self._events:
+            for ev, _ in CELL_EVENTS: self._events.event_detach(ev)
+            self._events = None
+        player, self.player = self.player, None
+        return player
+
+    def _cancel_timers(self):
+        for timer in (self.retry_timer, self.start_timer):
+            if timer: self.frame.after_cancel(timer)
+        self.retry_timer = self.start_timer = None
+
+    def _on_vlc_event(self, event, state):
+        """
+        Runs on a libVLC thread; tags the event with the current generation
+        and posts it to the Tk thread. Must not block: player.stop() waits
+        for this callback to return.
+        """
+        self.post(self._apply_state, self.generation, state)
+
+    def _apply_state(self, generation, state):
+        """Updates the overlay for a VLC state change (Tk thread)."""
+        if generation != self.generation or not self.stream or self.stop_inflight: return # Stale, stopped or being torn down
+        if self.start_timer:
+            self.frame.after_cancel(self.start_timer)
+            self.start_timer = None
+        if state == "lost":
+            self.set_text(self.status_label, "No Signal", "red")
+            self.show_status(True)
+            self.schedule_retry()
+        else:
+            self.backoff = 1.0
+            self.show_status(False)
+
+    def set_text(self, label, text, fg=None):
+        """Reconfigures an overlay label only if its text or colour actually changes."""
+        last_text, last_fg = self._label_state[label]
+        if fg is None: fg = last_fg
+        if (text, fg) == (last_text, last_fg): return # Retries and page turns often repeat the same text
+        label.config(text=text, fg=fg)
+        self._label_state[label] = (text, fg)
+
+    def show_status(self, visible):
+        """Maps/unmaps the status overlay, skipping the Tcl calls if it is already there."""
+        if visible == self._status_visible: return
+        if visible:
+            self.status_label.place(relx=0.5, rely=0.5, anchor="center")
+            self.status_label.lift()
+        else: self.status_label.place_forget() # Unmapped: text changes no longer re-measure a visible widget
+        self._status_visible = visible
+
+    def schedule_retry(self):
+        """
+        Reconnects with exponential backoff (capped at 30 s) plus jitter,
+        so a flapping NVR is not hammered and Pis sharing one NVR don't
+        reconnect in lockstep.
+        """
+        if self.retry_timer or self.stop_inflight or not self.stream: return
+        delay = self.backoff + random.uniform(0, 0.5)
+        self.backoff = min(self.backoff * 2, 30)
+        self.retry_timer = self.frame.after(int(delay * 1000), self._retry)
+
+    def _retry(self):
+        """Replays the failed stream; play() tears it down on a helper thread first."""
+        self.retry_timer = None
+        if self.stream and not self.stop_inflight: self.play(*self.stream)
+
+    def _resume(self):
+        """Teardown finished: start whatever stream the cell holds now (play/stop calls meanwhile only recorded it)."""
+        self.stop_inflight = False
+        if self.stream and self.player: self.play(*self.stream)
 
 class SmartNVRTourApp:
     def __init__(self, root):
@@ -137,25 +340,86 @@ class SmartNVRTourApp:
         self.root.config(cursor="none")
         
         # Load Config
-        self.config = self.load_config()
+        self.config, on_disk = self.load_config()
+        self._config_snapshot = dumps_json(self.config) if on_disk else None # In-memory copy of what is on disk
+        self.compile_rtsp_url()
+        self._interval_ms = int(self.config.get("tour_interval", 10)) * 1000
+        self._last_info = None # Footer text currently shown
         self.tour_active = False
         self.current_page_index = 0
         self.active_cam_list = sorted(self.config.get("active_cameras", []))
         self.tour_timer = None # CRITICAL: To prevent timer stacking
+        self.stagger_timer = None
+        self.preview_player = None # Admin preview, created on first use
+        self._page_plans = []  # Per-page (cam_id, is_filler) tuples, see build_page_plans
+        self._page_texts = []  # Matching footer strings
+        self._total_pages = 1
+        self.closing = False
+        self.admin_open = False # Password prompt or dashboard is showing
+        self.dashboard = None   # Admin Toplevel, built once and withdrawn between visits
+        self._stats = {"cpu": 0.0, "ram": 0.0, "temp": "N/A", "disk": 0.0, "net_mb": 0.0}
+        self._cpu_prev = (0, 0)
+        self._stats_tick = 0
+        self._stat_fds = {}
+        self.stats_vars = {k: StringVar(self.root, value=f"{k.upper()}: ...") for k in STAT_KEYS}
+        self._stats_text = {} # Last text published per stat, see set_stat
+        self.stats_watchers = 0
+        self.stats_timer = None
+        self.ping_inflight = False
         
         # System Optimizations
         self.disable_screensaver()
         
         # --- VLC Instance ---
+        caching = int(self.config.get("network_caching", DEFAULT_CONFIG["network_caching"]))
+        is_arm = platform.machine().lower().startswith(("arm", "aarch64"))
         vlc_args = [
             "--no-xlib",
-            "--network-caching=300",
-            "--rtsp-tcp",
+            f"--network-caching={caching}", # Same budget as the per-media option, see get_media
+            f"--live-caching={caching}",
+            "--file-caching=0",
+            "--rtsp-tcp",              # Default; each Media sets the configured transport
             "--clock-jitter=0",
+            "--clock-synchro=0",
+            "--avcodec-hw=any",
+            # Skip deblocking on non-ref frames; on the Pi on all frames (CPU-bound, small cells hide the artefacts)
+            f"--avcodec-skiploopfilter={4 if is_arm else 1}",
+            "--avcodec-fast",             # Allow non-spec-compliant decoder speedups
+            "--avcodec-skip-frame=1",     # Always discard non-reference frames (lower frame rate, less decode CPU)
+            "--drop-late-frames",
+            "--skip-frames",
+            "--no-audio",             # Grid cells never render audio
             "--aspect-ratio=16:9", 
             "--quiet"
         ]
-        self.vlc_instance = vlc.Instance(*vlc_args)
+        if is_arm:
+            # Prefer the Pi's MMAL hardware decoder, fall back to software.
+            # The vout stays X11 so each stream lands in its Tk grid cell.
+            vlc_args.append("--codec=mmal_codec,avcodec,any")
+        self._vlc_args = vlc_args
+        self._vlc_instance = None # Created on first use, see vlc_instance
+        self.media_cache = {}    # cam_id -> vlc.Media, filled lazily by get_media
+        
+        # --- Background Event Loop ---
+        # Network I/O runs here; results are handed back to Tk via ui_queue
+        self.loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.ui_queue = queue.SimpleQueue()
+        self.pending_tasks = 0
+        self.drain_timer = None
+        self.tk_calls = queue.SimpleQueue() # (fn, args) posted by libVLC and helper threads, see post
+        self.tk_calls_timer = None
+        self._wake_r = self._wake_w = None # Self-pipe that wakes Tk for posted calls (Linux)
+        if sys.platform.startswith('linux'):
+            r, w = os.pipe()
+            os.set_blocking(r, False); os.set_blocking(w, False)
+            try:
+                self.root.tk.createfilehandler(r, tk.READABLE, self.on_wake)
+                self._wake_r, self._wake_w = r, w
+            except: # No file handlers in this Tk build: drain_tk_calls polls instead
+                os.close(r); os.close(w)
+        # Disk writes (config) go to one worker so they stay ordered and off the Tk thread
+        self.io_pool = ThreadPoolExecutor(max_workers=1)
         
         # --- UI Layout ---
         self.cells = []
@@ -167,64 +431,319 @@ class SmartNVRTourApp:
         self.info_label.pack(side=tk.BOTTOM, fill=tk.X)
 
         self.setup_grid_layout()
+        self.drain_tk_calls()
         
         # --- Bindings ---
         self.root.bind("<Control-Alt-s>", self.open_admin_panel)
         self.root.bind("<Escape>", self.on_close)
+        # Kiosk state is only re-asserted when the WM actually disturbs it (no polling)
+        self.root.bind("<Visibility>", self.enforce_kiosk_mode)
+        self.root.bind("<FocusOut>", self.enforce_kiosk_mode)
+        self.root.bind("<Unmap>", self.enforce_kiosk_mode)
         
         # --- Startup ---
         if not self.active_cam_list:
             self.root.after(1000, lambda: self.open_admin_panel(force=True))
         else:
             self.start_tour()
-            
-        # --- Background Tasks ---
-        self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
-        self.monitor_thread.start()
-        self.enforce_kiosk_mode()
 
     def load_config(self):
-        if not os.path.exists(CONFIG_FILE):
+        """
+        Returns (config, on_disk): the saved config with any missing keys
+        filled from DEFAULT_CONFIG, and whether the file now holds exactly
+        that. A missing or outdated file is (re)written once so new defaults
+        land on disk; an unreadable one is left alone until the next save.
+        """
+        saved = {}
+        if os.path.exists(CONFIG_FILE):
             try:
-                with open(CONFIG_FILE, 'w') as f: json.dump(DEFAULT_CONFIG, f, indent=4)
-            except: pass
-            return DEFAULT_CONFIG.copy()
-        try:
-            with open(CONFIG_FILE, 'r') as f: return json.load(f)
-        except: return DEFAULT_CONFIG.copy()
+                with open(CONFIG_FILE, 'rb') as f: saved = loads_json(f.read())
+                if not isinstance(saved, dict): raise ValueError("config is not an object")
+            except: return dict(DEFAULT_CONFIG), False
+        config = {**DEFAULT_CONFIG, **saved}
+        if config != saved:
+            try: write_json_atomic(CONFIG_FILE, config)
+            except: return config, False
+        return config, True
 
     def save_config(self):
-        try:
-            with open(CONFIG_FILE, 'w') as f: json.dump(self.config, f, indent=4)
-        except: pass
+        """
+        Queues a config write if it differs from what is on disk. The fsync
+        runs on io_pool; on_config_saved reports the outcome once it is known.
+        """
+        data = dumps_json(self.config)
+        if data == self._config_snapshot: # Disk already has it
+            self.on_config_saved(None)
+            return
+        self._config_snapshot = data
+        def write():
+            try: write_json_atomic(CONFIG_FILE, data)
+            except Exception as e: return e # Returned, not raised: drain_queue maps exceptions to None
+        self.watch_future(self.io_pool.submit(write), self.on_config_saved)
+
+    def on_config_saved(self, error):
+        from tkinter import messagebox
+        if error is None:
+            messagebox.showinfo("Saved", "Settings saved.", parent=self.root)
+            return
+        self._config_snapshot = None # Unknown on-disk state: the next save writes again
+        messagebox.showerror("Error", f"Could not save config: {error}", parent=self.root)
 
     def disable_screensaver(self):
-        if sys.platform.startswith('linux'):
+        # xset is X11-only; nothing to do on Wayland / console sessions
+        if sys.platform.startswith('linux') and os.environ.get("DISPLAY"):
+            import shutil, subprocess # Lazy: only needed for this one-off startup call
+            if not shutil.which("xset"): return # x11-xserver-utils not installed; skip the doomed fork
             try:
-                subprocess.run(["xset", "s", "off"], check=False)
-                subprocess.run(["xset", "-dpms"], check=False)
-                subprocess.run(["xset", "s", "noblank"], check=False)
+                # One xset invocation accepts all three directives (1 fork instead of 3)
+                subprocess.run(["xset", "s", "off", "-dpms", "s", "noblank"], check=False,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             except: pass
 
-    def enforce_kiosk_mode(self):
+    def enforce_kiosk_mode(self, event=None):
+        """Restores fullscreen/topmost if lost. Bound to <Visibility>/<FocusOut>/<Unmap> on the root window."""
+        if event is not None and event.widget is not self.root: return # Child widgets share root's bindtag
+        if self.closing or self.admin_open: return # Re-raising root would bury the admin dialogs
         try:
-            if not self.root.attributes('-fullscreen'): self.root.attributes('-fullscreen', True)
-            self.root.attributes('-topmost', True)
+            if self.root.state() == 'iconic': self.root.deiconify() # Minimized by the WM
+            if not self.root.attributes('-fullscreen'):
+                self.root.attributes('-fullscreen', True)
+            if not self.root.attributes('-topmost'):
+                self.root.attributes('-topmost', True)
         except: pass
-        self.root.after(5000, self.enforce_kiosk_mode)
+
+    @property
+    def vlc_instance(self):
+        """The shared vlc.Instance. Loading VLC's plugins is deferred until a stream actually plays."""
+        if self._vlc_instance is None:
+            self._vlc_instance = vlc.Instance(*self._vlc_args)
+        return self._vlc_instance
+
+    def compile_rtsp_url(self):
+        """Pre-renders the channel-independent parts of the RTSP URL. Call after every config change."""
+        c = self.config
+        user, pwd = quote(str(c['nvr_user']), safe=''), quote(str(c['nvr_pass']), safe='')
+        self._rtsp_prefix = f"rtsp://{user}:{pwd}@{c['nvr_ip']}:{c['nvr_port']}/cam/realmonitor?channel="
+        self._rtsp_suffix = f"&subtype={c.get('subtype', '1')}"
+        try: self._nvr_addr = (str(c['nvr_ip']), int(c['nvr_port'])) # Probe target, parsed once
+        except (KeyError, ValueError): self._nvr_addr = None
 
     def build_rtsp_url(self, channel_id):
-        subtype = self.config.get('subtype', '1')
-        return (f"rtsp://{self.config['nvr_user']}:{self.config['nvr_pass']}@"
-                f"{self.config['nvr_ip']}:{self.config['nvr_port']}/"
-                f"cam/realmonitor?channel={channel_id}&subtype={subtype}")
+        return f"{self._rtsp_prefix}{channel_id}{self._rtsp_suffix}"
+
+    def get_media(self, cam_id):
+        """Returns the cached vlc.Media for a channel, so page turns and reconnects skip URL/MRL setup."""
+        media = self.media_cache.get(cam_id)
+        if media is None:
+            media = self.vlc_instance.media_new(self.build_rtsp_url(cam_id))
+            media.add_option(f":network-caching={self.config.get('network_caching', DEFAULT_CONFIG['network_caching'])}")
+            media.add_option(":no-rtsp-tcp" if self.config.get("rtsp_transport") == "udp" else ":rtsp-tcp")
+            self.media_cache[cam_id] = media
+        return media
+
+    def rebuild_media_cache(self):
+        """
+        Drops stale media and pre-creates one per active camera. Call after
+        any config change; players keep their own reference to anything
+        still playing.
+        """
+        for media in self.media_cache.values(): media.release()
+        self.media_cache.clear()
+        if self._vlc_instance is None: return # Nothing has played yet; stay lazy
+        for cam_id in self.active_cam_list: self.get_media(cam_id)
+
+    # --- Background Tasks ---
+    def run_async(self, coro, callback):
+        """Runs a coroutine on the background loop; callback receives the result on the Tk thread."""
+        self.watch_future(asyncio.run_coroutine_threadsafe(coro, self.loop), callback)
+
+    def watch_future(self, future, callback):
+        """Hands a concurrent.futures.Future's result to callback on the Tk thread, via ui_queue."""
+        future.add_done_callback(lambda f: self.ui_queue.put((callback, f)))
+        self.pending_tasks += 1
+        if not self.drain_timer:
+            self.drain_timer = self.root.after(100, self.drain_queue)
+
+    def drain_queue(self):
+        """Delivers finished background results. Only scheduled while tasks are pending."""
+        self.drain_timer = None
+        while True:
+            try: callback, future = self.ui_queue.get_nowait()
+            except queue.Empty: break
+            self.pending_tasks -= 1
+            try: result = future.result()
+            except Exception: result = None
+            callback(result)
+        if self.pending_tasks > 0:
+            self.drain_timer = self.root.after(100, self.drain_queue)
+
+    def post(self, fn, *args):
+        """
+        Queues fn(*args) for the Tk thread. Safe from any thread and never
+        blocks, unlike a cross-thread after() on a threaded Tcl build.
+        """
+        self.tk_calls.put((fn, args))
+        w = self._wake_w
+        if w is not None:
+            try: os.write(w, b"\0")
+            except OSError: pass # Pipe full: a wakeup is already pending
+
+    def on_wake(self, fd, mask):
+        try: os.read(fd, 4096) # Consume wakeups before draining, so none is lost
+        except OSError: pass
+        self.drain_tk_calls()
+
+    def drain_tk_calls(self):
+        """
+        Runs calls posted from other threads (player state changes, teardown
+        completions) on the Tk thread. Driven by the self-pipe; only polls
+        where there is none.
+        """
+        self.tk_calls_timer = None
+        while True:
+            try: fn, args = self.tk_calls.get_nowait()
+            except queue.Empty: break
+            try: fn(*args)
+            except: pass # e.g. a cell whose frame was destroyed meanwhile
+        if self._wake_r is None and not self.closing:
+            self.tk_calls_timer = self.root.after(100, self.drain_tk_calls)
+
+    # --- System Stats ---
+    def open_stat_fds(self):
+        """Keeps the stat files open while the dashboard is up, so each sample is a single pread."""
+        for path in STAT_FILES:
+            if path in self._stat_fds: continue
+            try: self._stat_fds[path] = os.open(path, os.O_RDONLY)
+            except OSError: pass
+
+    def close_stat_fds(self):
+        for fd in self._stat_fds.values():
+            try: os.close(fd)
+            except OSError: pass
+        self._stat_fds.clear()
+
+    def read_stat_file(self, path):
+        """Reads a small /proc or sysfs file, reusing the cached fd when open."""
+        fd = self._stat_fds.get(path)
+        if fd is None:
+            with open(path, 'rb') as f: return f.read()
+        return os.pread(fd, 65536, 0) # /proc/net/dev grows with every interface
+
+    def watch_stats(self):
+        """Registers a stats observer; the shared sampler runs while any are registered."""
+        self.stats_watchers += 1
+        if self.stats_watchers == 1:
+            self.open_stat_fds()
+            self.update_stats()
+
+    def unwatch_stats(self):
+        self.stats_watchers = max(0, self.stats_watchers - 1)
+        if self.stats_watchers == 0:
+            if self.stats_timer:
+                self.root.after_cancel(self.stats_timer)
+                self.stats_timer = None
+            self.close_stat_fds()
+
+    def update_stats(self):
+        """Single shared stats tick: samples once and publishes to self.stats_vars."""
+        self.stats_timer = None
+        if not self.stats_watchers: return
+        try:
+            self.sample_stats()
+            st = self._stats
+            self.set_stat('cpu', f"CPU: {st['cpu']}%")
+            self.set_stat('ram', f"RAM: {st['ram']}%")
+            self.set_stat('disk', f"DSK: {st['disk']}%")
+            self.set_stat('temp', f"TMP: {st['temp']}")
+            self.set_stat('net', f"NET: {st['net_mb']:.1f} MB")
+            if not self.ping_inflight: # Next probe only once the previous one has answered
+                self.ping_inflight = True
+                self.run_async(tcp_probe(self._nvr_addr), self.on_ping)
+        except: pass
+        self.stats_timer = self.root.after(2000, self.update_stats)
+
+    def on_ping(self, ms):
+        self.ping_inflight = False
+        if ms is None: text = "Timeout"
+        else: text = f"{ms:.1f} ms" if ms >= 1 else "<1 ms"
+        self.set_stat('ping', f"PNG: {text}")
+
+    def set_stat(self, key, text):
+        """Sets a stats StringVar only when its text changed; every set() redraws the bound labels."""
+        if self._stats_text.get(key) == text: return
+        self.stats_vars[key].set(text)
+        self._stats_text[key] = text
+
+    def sample_stats(self):
+        """
+        Refreshes the self._stats snapshot. CPU, RAM, network and temperature
+        come from one plain read of /proc/stat, /proc/meminfo, /proc/net/dev
+        and sysfs each, disk from statvfs; psutil is only the fallback on
+        systems without /proc.
+        """
+        st = self._stats
+        try:
+            jiffies = [int(x) for x in self.read_stat_file("/proc/stat").split(b"\n", 1)[0].split()[1:]]
+            idle, total = jiffies[3] + jiffies[4], sum(jiffies) # idle + iowait
+            prev_idle, prev_total = self._cpu_prev
+            self._cpu_prev = (idle, total)
+            if total > prev_total:
+                st['cpu'] = round(100 * (1 - (idle - prev_idle) / (total - prev_total)), 1)
+            mem = {}
+            for line in self.read_stat_file("/proc/meminfo").split(b"\n", 3)[:3]: # MemTotal, MemFree, MemAvailable
+                key, val = line.split(b":", 1); mem[key] = int(val.split()[0])
+            st['ram'] = round(100 * (1 - mem[b'MemAvailable'] / mem[b'MemTotal']), 1)
+        except (OSError, ValueError, KeyError, IndexError):
+            import psutil # Lazy: kept off the kiosk startup path
+            st['cpu'] = psutil.cpu_percent(); st['ram'] = psutil.virtual_memory().percent
+        try:
+            st['temp'] = f"{int(self.read_stat_file(THERMAL_FILE))/1000:.1f}C"
+        except (OSError, ValueError):
+            st['temp'] = "N/A"
+        if self._stats_tick % 15 == 0: # statvfs is the slowest call; disk fill changes slowly (every 30 s)
+            try:
+                vfs = os.statvfs('/')
+                used = vfs.f_blocks - vfs.f_bfree
+                st['disk'] = round(100 * used / (used + vfs.f_bavail), 1) # Same formula as psutil.disk_usage
+            except (OSError, AttributeError, ZeroDivisionError):
+                import psutil
+                st['disk'] = psutil.disk_usage('/').percent
+        self._stats_tick += 1
+        try: # Bytes received, summed over all interfaces like psutil.net_io_counters()
+            rx = sum(int(line.split(b":", 1)[1].split()[0])
+                     for line in self.read_stat_file("/proc/net/dev").split(b"\n")[2:] if b":" in line)
+        except (OSError, ValueError, IndexError):
+            import psutil
+            rx = psutil.net_io_counters().bytes_recv
+        st['net_mb'] = rx / (1024*1024)
 
     # --- Grid Management ---
+    def reap_player(self, player, on_done=None):
+        """
+        Stops and releases a detached player on its own daemon thread, so a
+        wedged decoder never stalls the Tk loop and several players tear down
+        in parallel. on_done (if given) then runs on the Tk thread. Returns
+        the thread, or None when there was no player.
+        """
+        if player is None:
+            if on_done: on_done()
+            return None
+        def teardown():
+            try:
+                player.stop()
+                player.release()
+            finally:
+                if on_done and not self.closing: self.post(on_done)
+        t = threading.Thread(target=teardown, daemon=True)
+        t.start()
+        return t
+
     def setup_grid_layout(self):
         """Dynamically creates the grid based on config."""
         for cell in self.cells:
-            cell.stop()
-            cell.frame.destroy()
+            cell.frame.grid_forget()
+            # The frame outlives its player: VLC may still be drawing into it until stop() returns
+            self.reap_player(cell.detach(), cell.frame.destroy)
         self.cells = []
         
         target_size = int(self.config.get("grid_size", 4))
@@ -243,94 +762,114 @@ class SmartNVRTourApp:
             
         for r in range(rows):
             for c in range(cols):
-                cell = CameraCell(self.grid_container, self.vlc_instance)
+                cell = CameraCell(self.grid_container, lambda: self.vlc_instance, self.get_media, self.post)
                 cell.frame.grid(row=r, column=c, sticky="nsew", padx=1, pady=1)
                 self.cells.append(cell)
         
         self.cells_per_page = len(self.cells)
+        self.build_page_plans()
 
     # --- Tour Logic ---
+    def build_page_plans(self):
+        """
+        Precomputes each page's (cam_id, is_filler) layout, random fillers
+        included, and its footer text so a page turn is a plain lookup. Call
+        whenever active_cam_list, cells_per_page or the interval changes.
+        """
+        cams, limit = self.active_cam_list, self.cells_per_page
+        active_set = set(cams)
+        plans, reals = [], [] # reals: non-filler count per page, for the footer
+        for start in range(0, len(cams), limit):
+            batch = cams[start : start + limit]
+            reals.append(len(batch))
+            plan = [(c, False) for c in batch]
+            # --- Random Fill Logic ---
+            needed = limit - len(batch)
+            if needed > 0 and len(cams) > len(batch):
+                candidates = sorted(active_set.difference(batch))
+                # If candidates are scarce, just reuse active list (choices allows repeats)
+                if len(candidates) < needed: candidates = cams
+                plan += [(c, True) for c in random.choices(candidates, k=needed)]
+            plans.append(tuple(plan))
+        self._page_plans = plans
+        self._total_pages = max(1, len(plans)) # == ceil(len(cams) / limit)
+        interval = self._interval_ms // 1000
+        self._page_texts = [
+            f"Page {n}/{self._total_pages} | Cams: {real} (+{limit - real} Fillers) | Interval: {interval}s"
+            for n, real in enumerate(reals, 1)
+        ]
+
     def start_tour(self):
         self.tour_active = True
         self.update_grid_content()
 
     def stop_tour_timer(self):
-        """Cancels pending page turn to prevent rapid cycling."""
-        if self.tour_timer:
-            try:
-                self.root.after_cancel(self.tour_timer)
-            except: pass
-            self.tour_timer = None
+        """Cancels pending page turn (and any staggered cell starts) to prevent rapid cycling."""
+        for timer in (self.tour_timer, self.stagger_timer):
+            if timer:
+                try:
+                    self.root.after_cancel(timer)
+                except: pass
+        self.tour_timer = self.stagger_timer = None
 
     def update_grid_content(self):
         """Loads cameras for the current page."""
         # Safety Stop of existing timer
         self.stop_tour_timer()
 
-        if not self.tour_active or not self.active_cam_list: return
+        if not self.tour_active: return
+        if not self.active_cam_list: # Every camera deselected: clear the grid rather than leave old streams up
+            for cell in self.cells: cell.show_empty()
+            self.set_info("No active cameras")
+            return
 
-        total_cams = len(self.active_cam_list)
-        limit = self.cells_per_page
-        
-        start_idx = self.current_page_index * limit
-        current_batch = self.active_cam_list[start_idx : start_idx + limit]
-        
-        # --- Random Fill Logic ---
-        needed = limit - len(current_batch)
-        if needed > 0 and len(self.active_cam_list) > len(current_batch):
-            # Find candidates not in current batch
-            candidates = [c for c in self.active_cam_list if c not in current_batch]
-            # If candidates are scarce, just reuse active list
-            if len(candidates) < needed:
-                candidates = self.active_cam_list
-            
-            # Select random fillers
-            if candidates:
-                # Use choices to allow repeats if candidates < needed
-                fillers = random.choices(candidates, k=needed)
-                # We store them as a tuple (id, is_filler) for processing
-                display_batch = [(c, False) for c in current_batch] + [(c, True) for c in fillers]
-            else:
-                display_batch = [(c, False) for c in current_batch]
-        else:
-            display_batch = [(c, False) for c in current_batch]
+        if self.current_page_index >= self._total_pages: self.current_page_index = 0
+        display_batch = self._page_plans[self.current_page_index]
 
         # Update Info Footer
-        page_num = self.current_page_index + 1
-        total_pages = math.ceil(total_cams / limit)
-        self.info_label.config(text=f"Page {page_num}/{total_pages} | Cams: {len(current_batch)} (+{needed} Fillers) | Interval: {self.config['tour_interval']}s")
-
-        for i, cell in enumerate(self.cells):
-            if i < len(display_batch):
-                cam_id, is_filler = display_batch[i]
-                url = self.build_rtsp_url(cam_id)
-                cell.play(url, cam_id, is_filler)
-            else:
-                cell.stop()
-                cell.status_label.config(text="EMPTY", fg="#333")
-                cell.status_label.lift()
+        self.set_info(self._page_texts[self.current_page_index])
+
+        # Stagger stream starts so the NVR doesn't get N DESCRIBE/SETUPs at once
+        def start_cell(i):
+            self.stagger_timer = None
+            while i < len(self.cells):
+                cell = self.cells[i]
+                if i < len(display_batch):
+                    stream = display_batch[i]
+                    # Same camera in the same slot with current media: leave it streaming (or retrying)
+                    if cell.stream != stream or cell.media is not self.media_cache.get(stream[0]):
+                        cell.play(*stream)
+                        self.stagger_timer = self.root.after(STAGGER_MS, start_cell, i + 1)
+                        return
+                else:
+                    cell.show_empty()
+                i += 1
+            self.grid_container.update_idletasks() # One layout pass once the page is filled
+        start_cell(0)
 
-        # Schedule next page
-        interval_ms = int(self.config.get("tour_interval", 10)) * 1000
-        self.tour_timer = self.root.after(interval_ms, self.next_page)
+        # Schedule next page (a single-page tour has nothing to turn to)
+        if self._total_pages > 1:
+            self.tour_timer = self.root.after(self._interval_ms, self.next_page)
+
+    def set_info(self, info):
+        if info != self._last_info: # Unchanged footers (e.g. re-saving settings) skip the Tk call
+            self.info_label.config(text=info)
+            self._last_info = info
 
     def next_page(self):
         if not self.active_cam_list: return
-        total_pages = math.ceil(len(self.active_cam_list) / self.cells_per_page)
         self.current_page_index += 1
-        if self.current_page_index >= total_pages:
+        if self.current_page_index >= self._total_pages:
             self.current_page_index = 0
         self.update_grid_content()
 
-    def monitor_loop(self):
-        while True:
-            for cell in self.cells: cell.check_health()
-            time.sleep(2)
-
     # ==========================================
     # ADMIN DASHBOARD
     # ==========================================
     def open_admin_panel(self, event=None, force=False):
+        if self.admin_open: return # Prompt or dashboard already up
+        from tkinter import simpledialog, messagebox # Lazy: only the admin path needs the dialogs
+        self.admin_open = True
         self.root.config(cursor="arrow")
         pwd = simpledialog.askstring("Admin", "Enter Admin Password:", parent=self.root, show='*')
         
@@ -340,20 +879,34 @@ class SmartNVRTourApp:
             if force:
                 messagebox.showerror("Error", "Auth Failed. Exiting.")
                 sys.exit(0)
+            self.admin_open = False
             self.root.config(cursor="none")
 
     def show_dashboard(self):
+        """
+        Builds the dashboard on first use; later visits re-show the same
+        (withdrawn) window with its fields reloaded from self.config.
+        """
+        if self.dashboard is not None and self.dashboard.winfo_exists():
+            self.dashboard.refresh()
+            return
         dash = Toplevel(self.root)
         dash.title("System Configuration")
         dash.geometry("900x750")
         dash.configure(bg="#1a1a1a")
         dash.attributes('-topmost', True)
         
+        preview_media = {} # URL -> vlc.Media for this visit; repeat clicks skip media_new
+        
         def on_close():
-            if hasattr(dash, 'preview_player') and dash.preview_player:
-                dash.preview_player.stop()
+            if self.preview_player:
+                self.preview_player.stop() # Kept alive for the next dashboard visit
+            for media in preview_media.values(): media.release()
+            preview_media.clear()
+            self.unwatch_stats()
             self.root.config(cursor="none")
-            dash.destroy()
+            self.admin_open = False
+            dash.withdraw() # Kept for the next visit, see refresh()
         dash.protocol("WM_DELETE_WINDOW", on_close)
 
         col_left = Frame(dash, bg="#1a1a1a", width=250); col_left.pack(side=tk.LEFT, fill=tk.Y, padx=10, pady=10)
@@ -363,46 +916,19 @@ class SmartNVRTourApp:
         # LEFT: STATS
         lbl_stats = LabelFrame(col_left, text=" System Health ", bg="#1a1a1a", fg="#00ff00", font=("Arial", 10, "bold"))
         lbl_stats.pack(fill=tk.X)
-        stats_labels = {}
-        for k in ["cpu", "ram", "temp", "disk", "net", "ping"]:
-            l = Label(lbl_stats, text=f"{k.upper()}: ...", bg="#1a1a1a", fg="white", font=("Monospace", 9), anchor="w")
-            l.pack(fill=tk.X, padx=5, pady=2); stats_labels[k] = l
-
-        def get_ping_ms():
-            try:
-                res = subprocess.run(["ping", "-c", "1", "-W", "1", self.config['nvr_ip']], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                if res.returncode == 0:
-                    match = re.search(r'time[=<]([\d\.]+)', res.stdout)
-                    return f"{match.group(1)} ms" if match else "<1 ms"
-                return "Timeout"
-            except: return "Error"
-
-        def update_stats_loop():
-            if not dash.winfo_exists(): return
-            try:
-                stats_labels['cpu'].config(text=f"CPU: {psutil.cpu_percent()}%")
-                stats_labels['ram'].config(text=f"RAM: {psutil.virtual_memory().percent}%")
-                stats_labels['disk'].config(text=f"DSK: {psutil.disk_usage('/').percent}%")
-                temp = "N/A"
-                if os.path.exists("/sys/class/thermal/thermal_zone0/temp"):
-                    with open("/sys/class/thermal/thermal_zone0/temp") as f: temp = f"{int(f.read())/1000:.1f}C"
-                stats_labels['temp'].config(text=f"TMP: {temp}")
-                stats_labels['ping'].config(text=f"PNG: {get_ping_ms()}")
-                net = psutil.net_io_counters(); mb_recv = net.bytes_recv / (1024*1024)
-                stats_labels['net'].config(text=f"NET: {mb_recv:.1f} MB")
-            except: pass
-            dash.after(2000, update_stats_loop)
-        update_stats_loop()
+        for k in STAT_KEYS:
+            Label(lbl_stats, textvariable=self.stats_vars[k], bg="#1a1a1a", fg="white", font=("Monospace", 9), anchor="w").pack(fill=tk.X, padx=5, pady=2)
+        self.watch_stats()
 
         # MIDDLE: CONFIG
+        # Packed only after all rows exist, so grid geometry is solved once
         lbl_conf = LabelFrame(col_mid, text=" Settings ", bg="#1a1a1a", fg="#00ccff", font=("Arial", 10, "bold"))
-        lbl_conf.pack(fill=tk.X, pady=(0, 20))
         entries = {}
-        fields = [("NVR IP", "nvr_ip"), ("Port", "nvr_port"), ("User", "nvr_user"), ("Pass", "nvr_pass"), ("Interval (s)", "tour_interval")]
+        fields = [("NVR IP", "nvr_ip"), ("Port", "nvr_port"), ("User", "nvr_user"), ("Pass", "nvr_pass"), ("Interval (s)", "tour_interval"), ("Caching (ms)", "network_caching")]
         for i, (txt, key) in enumerate(fields):
             Label(lbl_conf, text=txt, bg="#1a1a1a", fg="white").grid(row=i, column=0, sticky="e", padx=5, pady=5)
             e = Entry(lbl_conf, bg="#333", fg="white", insertbackground="white")
-            e.insert(0, str(self.config.get(key, "")))
+            e.insert(0, str(self.config.get(key, DEFAULT_CONFIG.get(key, ""))))
             e.grid(row=i, column=1, sticky="ew", padx=5)
             entries[key] = e
 
@@ -415,6 +941,12 @@ class SmartNVRTourApp:
         sub_var.set("Sub Stream (Fast)" if str(self.config.get("subtype", "1")) == "1" else "Main Stream (HD)")
         OptionMenu(lbl_conf, sub_var, "Main Stream (HD)", "Sub Stream (Fast)").grid(row=len(fields)+1, column=1, sticky="ew")
 
+        Label(lbl_conf, text="Transport", bg="#1a1a1a", fg="white").grid(row=len(fields)+2, column=0, sticky="e", padx=5)
+        transport_var = StringVar(dash)
+        transport_var.set("UDP (Low Latency)" if self.config.get("rtsp_transport") == "udp" else "TCP (Reliable)")
+        OptionMenu(lbl_conf, transport_var, "TCP (Reliable)", "UDP (Low Latency)").grid(row=len(fields)+2, column=1, sticky="ew")
+        lbl_conf.pack(fill=tk.X, pady=(0, 20))
+
         # RIGHT: CAM SELECTOR
         lbl_preview = LabelFrame(col_right, text=" Preview ", bg="#1a1a1a", fg="yellow", font=("Arial", 10, "bold"))
         lbl_preview.pack(fill=tk.X)
@@ -423,61 +955,78 @@ class SmartNVRTourApp:
         preview_label = Label(preview_frame, text="Select cam", bg="black", fg="gray")
         preview_label.place(relx=0.5, rely=0.5, anchor="center")
 
-        dash.preview_player = self.vlc_instance.media_player_new()
-        if sys.platform.startswith('linux'): dash.preview_player.set_xwindow(preview_frame.winfo_id())
-        else: dash.preview_player.set_hwnd(preview_frame.winfo_id())
-
         def show_preview(cam_id):
-            user = entries['nvr_user'].get(); pwd = entries['nvr_pass'].get()
+            user = quote(entries['nvr_user'].get(), safe=''); pwd = quote(entries['nvr_pass'].get(), safe='')
             ip = entries['nvr_ip'].get(); port = entries['nvr_port'].get()
             url = f"rtsp://{user}:{pwd}@{ip}:{port}/cam/realmonitor?channel={cam_id}&subtype=1"
-            dash.preview_player.stop()
-            media = self.vlc_instance.media_new(url)
-            dash.preview_player.set_media(media)
-            dash.preview_player.play()
+            if not self.preview_player: # One player shared by every dashboard visit
+                self.preview_player = self.vlc_instance.media_player_new()
+            player = self.preview_player
+            player.stop()
+            # The player outlives dashboards; re-target it in case this one was rebuilt
+            if sys.platform.startswith('linux'): player.set_xwindow(preview_frame.winfo_id())
+            else: player.set_hwnd(preview_frame.winfo_id())
+            media = preview_media.get(url)
+            if media is None:
+                media = preview_media[url] = self.vlc_instance.media_new(url)
+            player.set_media(media)
+            player.play()
             preview_label.lower()
 
+        # Like the settings panel, packed only once all 32 buttons are gridded
         lbl_cams = LabelFrame(col_right, text=" Active Cameras ", bg="#1a1a1a", fg="#00ff00", font=("Arial", 10, "bold"))
-        lbl_cams.pack(fill=tk.BOTH, expand=True, pady=10)
-        chk_vars = {}; current_active = self.config.get("active_cameras", [])
-        
+        selected = set(self.config.get("active_cameras", [])) # Plain set instead of 32 Tcl IntVars
+        buttons = {}
+
+        def on_cam_click(c): # One toggle handler shared by all camera buttons
+            on = c not in selected
+            if on: selected.add(c)
+            else: selected.discard(c)
+            buttons[c].config(bg="#00aa00" if on else "#444", relief="sunken" if on else "raised")
+            show_preview(c)
+
         for i in range(1, 33):
-            var = IntVar(value=1 if i in current_active else 0); chk_vars[i] = var
-            def on_cam_click(c=i, v=var):
-                v.set(1 if v.get() == 0 else 0)
-                btn = buttons[c]
-                btn.config(bg="#00aa00" if v.get() else "#444", relief="sunken" if v.get() else "raised")
-                show_preview(c)
-            btn = Button(lbl_cams, text=f"{i}", bg="#00aa00" if i in current_active else "#444", fg="white", width=3, command=lambda c=i, v=var: on_cam_click(c, v))
+            btn = Button(lbl_cams, text=f"{i}", bg="#00aa00" if i in selected else "#444", fg="white", width=3, command=lambda c=i: on_cam_click(c))
             btn.grid(row=(i-1)//4, column=(i-1)%4, padx=2, pady=2)
-            if not hasattr(dash, 'cam_buttons'): dash.cam_buttons = {}
-            buttons = dash.cam_buttons; buttons[i] = btn
+            buttons[i] = btn
+        lbl_cams.pack(fill=tk.BOTH, expand=True, pady=10)
 
         def save_and_restart():
-            # Stop existing timer immediately
-            self.stop_tour_timer()
+            old = dict(self.config)
             
             for k, e in entries.items():
-                if k == "tour_interval":
+                if k in ("tour_interval", "network_caching"):
                     try: self.config[k] = int(e.get())
-                    except: self.config[k] = 10
+                    except: self.config[k] = DEFAULT_CONFIG[k]
                 else: self.config[k] = e.get()
             
             try: self.config["grid_size"] = int(grid_var.get())
             except: self.config["grid_size"] = 4
             self.config["subtype"] = "1" if "Sub" in sub_var.get() else "0"
+            self.config["rtsp_transport"] = "udp" if "UDP" in transport_var.get() else "tcp"
             
-            new_active = [c for c, v in chk_vars.items() if v.get() == 1]
+            new_active = sorted(selected)
             self.config["active_cameras"] = new_active
-            self.active_cam_list = sorted(new_active)
-            self.save_config()
+            if self.config == old: # Nothing edited: keep the running tour and its streams
+                on_close()
+                return
             
-            messagebox.showinfo("Saved", "Updating...")
+            # Stop existing timer immediately
+            self.stop_tour_timer()
+            self.active_cam_list = list(new_active)
+            self.save_config()
+            self._interval_ms = self.config["tour_interval"] * 1000
+            if any(self.config.get(k) != old.get(k) for k in STREAM_KEYS):
+                self.compile_rtsp_url()
+                self.rebuild_media_cache()
             on_close()
             
             # Restart Tour
             self.current_page_index = 0
-            self.setup_grid_layout()
+            if self.config["grid_size"] != int(old.get("grid_size", 4)):
+                self.setup_grid_layout()
+            else:
+                self.build_page_plans() # Same shape: keep cells and their players
             self.update_grid_content()
 
         btn_frame = Frame(dash, bg="#1a1a1a")
@@ -485,10 +1034,48 @@ class SmartNVRTourApp:
         Button(btn_frame, text="SAVE & RESTART", command=save_and_restart, bg="green", fg="white", font=("Arial", 12, "bold")).pack(side=tk.LEFT, padx=20, expand=True, fill=tk.X)
         Button(btn_frame, text="EXIT APP", command=self.on_close, bg="#cc0000", fg="white", font=("Arial", 12)).pack(side=tk.RIGHT, padx=20)
 
+        def refresh():
+            """Reloads every field from self.config and shows the withdrawn dashboard again."""
+            for key, e in entries.items():
+                e.delete(0, tk.END)
+                e.insert(0, str(self.config.get(key, DEFAULT_CONFIG.get(key, ""))))
+            grid_var.set(str(self.config.get("grid_size", 4)))
+            sub_var.set("Sub Stream (Fast)" if str(self.config.get("subtype", "1")) == "1" else "Main Stream (HD)")
+            transport_var.set("UDP (Low Latency)" if self.config.get("rtsp_transport") == "udp" else "TCP (Reliable)")
+            active = set(self.config.get("active_cameras", []))
+            for c in (selected ^ active) & buttons.keys(): # Only buttons whose state differs from what they show
+                on = c in active
+                buttons[c].config(bg="#00aa00" if on else "#444", relief="sunken" if on else "raised")
+            selected.clear(); selected.update(active)
+            preview_label.lift() # Back to "Select cam" until a camera is clicked
+            dash.deiconify()
+            dash.lift()
+            self.watch_stats()
+        dash.refresh = refresh
+        self.dashboard = dash
+
     def on_close(self, event=None):
+        if self.closing: return
+        self.closing = True
         self.stop_tour_timer()
-        for cell in self.cells: cell.stop()
+        if self.tk_calls_timer: self.root.after_cancel(self.tk_calls_timer)
+        if self._wake_r is not None: # fds stay open: late posts from teardown threads must not hit a reused fd
+            self.root.tk.deletefilehandler(self._wake_r)
+            self._wake_w = None
+        
+        # libVLC can hang in stop() when the decoder is wedged; bound the teardown.
+        # detach() unhooks the event callbacks first, so the Stopped event each
+        # reaper's stop() raises never has to reach this (joining) thread.
+        players = [cell.detach() for cell in self.cells] + [self.preview_player]
+        self.preview_player = None
+        reapers = [t for t in map(self.reap_player, players) if t]
+        deadline = time.monotonic() + 1.5
+        for t in reapers: t.join(timeout=max(0, deadline - time.monotonic()))
+        
+        self.io_pool.shutdown(wait=True) # Let a pending config write reach the disk
+        self.loop.call_soon_threadsafe(self.loop.stop)
         self.root.destroy()
+        if any(t.is_alive() for t in reapers): os._exit(0) # Skip interpreter teardown that would block on VLC
         sys.exit(0)
 
 if __name__ == "__main__":